@@ -4,6 +4,7 @@ from ..lex import (
     Equals,
     Identifier,
     Source,
+    TokenStream,
 )
 
 
@@ -18,20 +19,20 @@ class Xml:
                 r'"[^"]*"',
             ]
         ),
+        r"['\"]",
     )
-    TagName: type[Token] = Token.define("Tag Name", r"[A-Za-z0-9][A-Za-z0-9_.-]*")
-    Comment: type[Token] = Token.define("Comment", r"<!--.*-->")
-    Cdata: type[Token] = Token.define("CDATA", r"<!\[CDATA\[[^\]]*\]\]>")
+    TagName: type[Token] = Token.define(
+        "Tag Name", r"[A-Za-z0-9][A-Za-z0-9_.-]*", r"[A-Za-z0-9]"
+    )
+    Comment: type[Token] = Token.define("Comment", r"<!--.*-->", r"<")
+    Cdata: type[Token] = Token.define("CDATA", r"<!\[CDATA\[[^\]]*\]\]>", r"<")
     OpenTag: type[Token] = Token.define("Open Tag", r"<")
     OpenSelfClosingTag: type[Token] = Token.define("Open Self-closing Tag", r"</")
     CloseOpeningTag: type[Token] = Token.define("Close Opening Tag", r">")
     CloseClosingTag: type[Token] = Token.define("Close Closing Tag", r"/>")
-    Text: type[Token] = Token.define(
-        "Text",
-        r"[!\"#$%&'()*+,\-./0-9:;=>?@A-Z\[\\\]^_`a-z{|}~]"
-        r"[ !\"#$%&'()*+,\-./0-9:;=>?@A-Z\[\\\]^_`a-z{|}~]*"
-        r"[^ \t<]",
-    )
+    # runs without whitespace or "<", separated by spaces: every character can
+    # only be consumed one way, so a failed match never backtracks
+    Text: type[Token] = Token.define("Text", r"[^\s<]+(?: +[^\s<]+)*", r"[^\s<]")
 
     token_types_excluding_text: list[type[Token]] = [
         OpenXmlDeclaration,
@@ -54,19 +55,21 @@ class Xml:
             class Instance(AbstractLexer.Instance):
                 def __init__(self, src: Source):
                     super().__init__(src)
+                    self.token_types: tuple[type[Token], ...] = tuple(Xml.token_types)
+                    self.token_types_excluding_text: tuple[type[Token], ...] = tuple(
+                        Xml.token_types_excluding_text
+                    )
 
-                def lex(self) -> list[Token]:
-                    result: list[Token] = []
+                def lex(self) -> TokenStream:
+                    # the last token type comes from parse_token, since tokens
+                    # stays empty when lexing raw
+                    last: type[Token] | None = None
                     self.skip_whitespace()
-                    while self.src[self.pos] != "eof":
-                        if result:
-                            print(result[-1])
-                        if result and result[-1].token_type() == "Close Opening Tag":
-                            result.append(self.parse_token(Xml.token_types))
+                    while self.pos < len(self.src.text):
+                        if last is Xml.CloseOpeningTag:
+                            last = self.parse_token(self.token_types)
                         else:
-                            result.append(
-                                self.parse_token(Xml.token_types_excluding_text)
-                            )
-                    return result
+                            last = self.parse_token(self.token_types_excluding_text)
+                    return self.tokens
 
             self.Instance: type[AbstractLexer.Instance] = Instance
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-from collections.abc import Iterator
+from array import array
+from bisect import bisect_right
+from collections.abc import Callable, Iterator, Sequence
 from dataclasses import InitVar, dataclass, field
-from functools import total_ordering
+from functools import cache, total_ordering
 import re
-from typing import ClassVar
+import sys
+from typing import ClassVar, overload
 
 
 @total_ordering
@@ -23,28 +26,41 @@ class Cursor:
     def __lt__(self, other: Cursor) -> bool:
         return self.row < other.row or (self.row == other.row and self.col < other.col)
 
+    @staticmethod
+    def from_offset(src: Source, pos: int) -> Cursor:
+        row: int = src.row(pos)
+        return Cursor(row, pos - src.line_starts[row])
+
 
 @dataclass(frozen=True)
 class CursorRange:
-    start: Cursor
-    end: Cursor
+    start: int
+    end: int
 
     def __post_init__(self):
         if self.start > self.end:
             raise ValueError(f"start ({self.start}) is after end ({self.end})")
 
-    def __iter__(self) -> Iterator[Cursor]:
+    def __iter__(self) -> Iterator[int]:
         yield self.start
         yield self.end
 
 
 @dataclass
 class Source:
-    src: InitVar[str]
+    src: InitVar[str | bytes]
+    text: str = field(init=False)
     lines: list[str] = field(init=False)
+    line_starts: list[int] = field(init=False)
 
-    def __post_init__(self, src: str):
-        self.lines = src.split("\n")
+    def __post_init__(self, src: str | bytes):
+        # bytes are decoded once up front; ascii text is stored one byte per
+        # character either way
+        self.text = src.decode("utf-8") if isinstance(src, bytes) else src
+        self.lines = self.text.split("\n")
+        self.line_starts = [0]
+        for line in self.lines[:-1]:
+            self.line_starts.append(self.line_starts[-1] + len(line) + 1)
 
     @property
     def rows(self) -> int:
@@ -53,78 +69,97 @@ class Source:
     def cols(self, row: int) -> int:
         return len(self.lines[row])
 
-    def valid(self, pos: Cursor) -> bool:
-        row: int
-        col: int
-        row, col = pos
-        return row < self.rows and col <= self.cols(row)
+    def row(self, pos: int) -> int:
+        return bisect_right(self.line_starts, pos) - 1
 
-    def next(self, pos: Cursor, *, n: int = 1) -> Cursor:
-        match n:
-            case 1:
-                if self[pos] == "eof":
-                    raise StopIteration
+    def line_span(self, pos: int) -> tuple[int, int]:
+        row: int = self.row(pos)
+        return self.line_starts[row], self.line_starts[row] + self.cols(row)
 
-                if pos.col == self.cols(pos.row):
-                    return Cursor(pos.row + 1, 0)
-                else:
-                    return Cursor(pos.row, pos.col + 1)
-
-            case _:
-                for _ in range(n):
-                    pos = self.next(pos)
-                return pos
-
-    def range(self, start: Cursor, end: Cursor | None = None) -> Iterator[Cursor]:
-        pos: Cursor = start
-        while pos != end:
-            yield pos
-            if self[pos] == "eof":
-                break
-            else:
-                pos = self.next(pos)
+    def valid(self, pos: int) -> bool:
+        return 0 <= pos <= len(self.text)
 
-    def len(self, rng: CursorRange) -> int:
-        return sum(1 for _ in self.range(rng.start, rng.end))
+    def next(self, pos: int, *, n: int = 1) -> int:
+        if pos + n > len(self.text):
+            raise StopIteration
+        return pos + n
 
-    def char_at(self, pos: Cursor) -> str:
-        row: int
-        col: int
-        row, col = pos
+    def range(self, start: int, end: int | None = None) -> Iterator[int]:
+        # without an end, the range runs up to and including eof
+        stop: int = len(self.text) + 1
+        return iter(range(start, stop if end is None else min(end, stop)))
+
+    def len(self, rng: CursorRange) -> int:
+        return rng.end - rng.start
 
-        if col == self.cols(row):
-            return "eof" if row == self.rows - 1 else "\n"
-        else:
-            return self.lines[row][col]
+    def char_at(self, pos: int) -> str:
+        return "eof" if pos == len(self.text) else self.text[pos]
 
     def str_at(self, rng: CursorRange) -> str:
-        start: Cursor
-        end: Cursor
-        start, end = rng
-        return "".join(self[pos] for pos in self.range(start, end))
+        return self.text[rng.start : rng.end]
 
-    def __getitem__(self, key: Cursor | CursorRange) -> str:
+    def __getitem__(self, key: int | CursorRange) -> str:
         match key:
-            case Cursor():
+            case int():
                 return self.char_at(key)
 
             case CursorRange():
                 return self.str_at(key)
 
 
-@dataclass
 class Token:
-    src: Source = field(repr=False)
-    rng: CursorRange
-    lexeme: str = field(init=False)
-    alternative: Token | None = field(default=None, repr=False)
+    # tokens are created once per lexeme, so they skip the per-instance dict
+    __slots__ = ("src", "start", "end", "lexeme")
+
+    src: Source
+    start: int
+    end: int
+    lexeme: str
 
+    TOKEN_TYPE: ClassVar[str] = "Token"
+    TOKEN_TYPE_ID: ClassVar[int]
     compiled_regex: ClassVar[re.Pattern]
+    # matches every character a token of this type can start with, if known
+    compiled_first_regex: ClassVar[re.Pattern | None] = None
+
+    # regexes that only match themselves: plain characters and escaped punctuation
+    LITERAL_REGEX: ClassVar[re.Pattern] = re.compile(
+        r"(?:\\\W|[^\\.^$*+?{}\[\]|()])+", re.ASCII
+    )
+
+    # every defined token type, indexed by TOKEN_TYPE_ID
+    registry: ClassVar[list[type[Token]]] = []
 
     __match_args__ = ("lexeme",)
 
-    def __post_init__(self):
-        self.lexeme = self.src[self.rng]
+    def __init__(self, src: Source, start: int, end: int, lexeme: str | None = None):
+        self.src = src
+        self.start = start
+        self.end = end
+        self.lexeme = src.text[start:end] if lexeme is None else lexeme
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}"
+            f"(start={self.start}, end={self.end}, lexeme={self.lexeme!r})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Token):
+            return NotImplemented
+        return (
+            type(self) is type(other)
+            and self.src == other.src
+            and self.start == other.start
+            and self.end == other.end
+        )
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.start, self.end))
+
+    @property
+    def rng(self) -> CursorRange:
+        return CursorRange(self.start, self.end)
 
     @property
     def len(self) -> int:
@@ -132,19 +167,109 @@ class Token:
 
     @classmethod
     def token_type(cls) -> str:
-        return cls.__name__
+        return cls.TOKEN_TYPE
 
     @staticmethod
-    def define(token_type: str, regex: str) -> type[Token]:
-        return type(token_type, (Token,), dict(compiled_regex=re.compile(regex)))
+    def define(token_type: str, regex: str, first: str | None = None) -> type[Token]:
+        # first is a regex for the characters a token can start with; it can
+        # be left out for literal regexes, otherwise every character is assumed
+        # regex is matched at the token start within the whole source, so ^,
+        # \b and lookbehinds see the text before the token, not a line slice
+        if first is None and Token.LITERAL_REGEX.fullmatch(regex):
+            first = re.escape(regex[1] if regex[0] == "\\" else regex[0])
+
+        token_class: type[Token] = type(
+            token_type,
+            (Token,),
+            dict(
+                __slots__=(),
+                TOKEN_TYPE=token_type,
+                TOKEN_TYPE_ID=len(Token.registry),
+                compiled_regex=re.compile(regex, re.ASCII),
+                compiled_first_regex=(
+                    None if first is None else re.compile(first, re.ASCII)
+                ),
+            ),
+        )
+        Token.registry.append(token_class)
+        return token_class
 
     @classmethod
     def regex(cls) -> re.Pattern:
         return cls.compiled_regex
 
 
-Character: type[Token] = Token.define("Character", r"[A-Za-z0-9_]")
-Identifier: type[Token] = Token.define("Identifier", r"[A-Za-z_][A-Za-z0-9_]*")
+class TokenStream(Sequence[Token]):
+    # short lexemes (punctuation, most names) repeat a lot and are interned
+    INTERN_MAX_LEN: ClassVar[int] = 8
+
+    # tokens are stored column-wise and only materialized as Token on access
+    def __init__(self, src: Source):
+        self.src: Source = src
+        self.types: list[int] = []
+        self.starts: array[int] = array("q")
+        self.ends: array[int] = array("q")
+        self.lexemes: list[str] = []
+        # other token types that matched ambiguous tokens, by token index
+        self.alternatives: dict[int, tuple[type[Token], ...]] = {}
+
+    def append(
+        self,
+        token_type: type[Token],
+        start: int,
+        end: int,
+        alternatives: tuple[type[Token], ...] = (),
+    ):
+        if alternatives:
+            self.alternatives[len(self.types)] = alternatives
+        self.types.append(token_type.TOKEN_TYPE_ID)
+        self.starts.append(start)
+        self.ends.append(end)
+        lexeme: str = self.src.text[start:end]
+        self.lexemes.append(
+            sys.intern(lexeme) if len(lexeme) <= TokenStream.INTERN_MAX_LEN else lexeme
+        )
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    @overload
+    def __getitem__(self, idx: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> list[Token]: ...
+
+    def __getitem__(self, idx: int | slice) -> Token | list[Token]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(len(self))[idx]]
+
+        idx = range(len(self))[idx]
+        start: int = self.starts[idx]
+        end: int = self.ends[idx]
+        lexeme: str = self.lexemes[idx]
+
+        return Token.registry[self.types[idx]](self.src, start, end, lexeme)
+
+    def alternatives_of(self, idx: int) -> tuple[Token, ...]:
+        # other readings of an ambiguous token, latest token type first
+        idx = range(len(self))[idx]
+        return tuple(
+            alternative(self.src, self.starts[idx], self.ends[idx], self.lexemes[idx])
+            for alternative in self.alternatives.get(idx, ())
+        )
+
+    def __iter__(self) -> Iterator[Token]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __repr__(self) -> str:
+        return f"TokenStream({list(self)!r})"
+
+
+Character: type[Token] = Token.define("Character", r"[A-Za-z0-9_]", r"[A-Za-z0-9_]")
+Identifier: type[Token] = Token.define(
+    "Identifier", r"[A-Za-z_][A-Za-z0-9_]*", r"[A-Za-z_]"
+)
 LeftParenthesis: type[Token] = Token.define("Left Parenthesis", r"\(")
 RightParenthesis: type[Token] = Token.define("Right Parenthesis", r"\)")
 LeftBracket: type[Token] = Token.define("Left Bracket", r"\[")
@@ -167,12 +292,16 @@ SingleQuote: type[Token] = Token.define("SingleQuote", r"'")
 
 class Lexer:
     WHITESPACE: set[str] = {" ", "\t", "\n"}
+    WHITESPACE_REGEX: re.Pattern = re.compile(
+        f"[{re.escape(''.join(sorted(WHITESPACE)))}]*", re.ASCII
+    )
 
     # todo: how to properly do exceptions?
     class Error(Exception):
-        def __init__(self, src: Source, pos: Cursor, msg: str = "an error occurred"):
+        def __init__(self, src: Source, pos: int, msg: str = "an error occurred"):
+            cursor: Cursor = Cursor.from_offset(src, pos)
             rows_to_show: list[int] = list(
-                range(max(0, pos.row - 3), min(src.rows, pos.row + 3))
+                range(max(0, cursor.row - 3), min(src.rows, cursor.row + 3))
             )
             # todo: this should come from utils lib for text column formatting
             # todo: also move this visualization code into Source
@@ -182,70 +311,168 @@ class Lexer:
                 for row in rows_to_show
             ]
             rows.insert(
-                rows_to_show.index(pos.row) + 1,
-                f"  {' ' * line_num_width} {' ' * pos.col}^",
+                rows_to_show.index(cursor.row) + 1,
+                f"  {' ' * line_num_width} {' ' * cursor.col}^",
             )
             super().__init__("\n".join([msg] + rows))
 
     class Instance:
         def __init__(self, src: Source):
             self.src: Source = src
-            self.pos: Cursor = Cursor(0, 0)
+            self.pos: int = 0
+            self.tokens: TokenStream = TokenStream(src)
+            # set by lex_raw to record (token type id, start, end) per token
+            # instead of filling tokens, which then stays empty
+            self.raw: list[tuple[int, int, int]] | None = None
+            # start and end of the line containing pos, refreshed when pos
+            # leaves it
+            self.line: tuple[int, int] = src.line_span(0)
 
         def skip_whitespace(self):
-            for pos in self.src.range(self.pos):
-                print(self.pos, self.src[self.pos])
-                self.pos = pos
-                if self.src[pos] not in Lexer.WHITESPACE:
-                    return
-
-        def parse_token(self, token_types: list[type[Token]]) -> Token:
-            matches: list[Token] = []
-            for token_type in token_types:
-                match token_type.regex().match(
-                    self.src.lines[self.pos.row][self.pos.col :]
-                ):
-                    case None:
-                        pass
-
-                    case match:
-                        matches.append(
-                            token_type(
-                                self.src,
-                                CursorRange(
-                                    self.pos, self.src.next(self.pos, n=match.end())
-                                ),
-                            )
-                        )
-
-            if not matches:
+            self.pos = Lexer.WHITESPACE_REGEX.match(self.src.text, self.pos).end()
+
+        def parse_token(self, token_types: Sequence[type[Token]]) -> type[Token]:
+            # token regexes never match across lines
+            if not self.line[0] <= self.pos <= self.line[1]:
+                self.line = self.src.line_span(self.pos)
+
+            result: type[Token] | None
+            end: int
+            alternatives: tuple[type[Token], ...]
+            result, end, alternatives = Lexer._scanner(tuple(token_types))(
+                self.src.text, self.pos, self.line[1]
+            )
+
+            if result is None:
+                cursor: Cursor = Cursor.from_offset(self.src, self.pos)
                 raise Lexer.Error(
-                    self.src, self.pos, f"could not parse token at {self.pos}"
+                    self.src, self.pos, f"could not parse token at {cursor}"
                 )
 
-            matches = sorted(matches, key=lambda token: token.len)
-            matches = [token for token in matches if token.len == matches[-1].len]
-
-            # if longest match fits multiple token types, chain alternatives
-            result = matches[0]
-            for match in matches[1:]:
-                match.alternative = result
-                result = match
+            if self.raw is None:
+                self.tokens.append(result, self.pos, end, alternatives)
+            else:
+                self.raw.append((result.TOKEN_TYPE_ID, self.pos, end))
 
-            self.pos = result.rng.end
+            self.pos = end
             self.skip_whitespace()
-            # print(self.src.lines[self.pos.row])
-            # print(" " * self.pos.col + "^")
-            # print(repr(self.src[self.pos]))
 
             return result
 
-        def lex(self) -> list[Token]:
+        def lex(self) -> TokenStream:
             raise NotImplementedError
 
-    def lex(self, src: Source) -> list[Token]:
+    @staticmethod
+    @cache
+    def _combined_regex(
+        token_types: tuple[type[Token], ...],
+    ) -> tuple[re.Pattern, tuple[int | None, ...]]:
+        # every token regex sits in its own capturing lookahead, so a single
+        # match reports how far each token type reaches from the same position
+        # while leaving longest match selection to the scanner; compiled once
+        # per tuple of token types and shared by every lexer
+        # regexes with their own groups or inline flags are left out and get
+        # None instead of a group number: numbered backreferences would point
+        # at the wrong group, named groups could collide and global flags are
+        # only allowed at the start of a pattern
+        combined: list[int] = [
+            i
+            for i, token_type in enumerate(token_types)
+            if token_type.regex().groups == 0
+            and not token_type.regex().flags & ~(re.ASCII | re.UNICODE)
+        ]
+        regex: re.Pattern = re.compile(
+            "".join(
+                f"(?=(?P<t{i}>{token_types[i].regex().pattern})|)" for i in combined
+            ),
+            re.ASCII,
+        )
+        return regex, tuple(
+            regex.groupindex[f"t{i}"] if i in combined else None
+            for i in range(len(token_types))
+        )
+
+    @staticmethod
+    def _candidates(
+        token_types: Sequence[type[Token]], char: str
+    ) -> tuple[type[Token], ...]:
+        return tuple(
+            token_type
+            for token_type in token_types
+            if token_type.compiled_first_regex is None
+            or token_type.compiled_first_regex.fullmatch(char)
+        )
+
+    @staticmethod
+    @cache
+    def _scanner(
+        token_types: tuple[type[Token], ...],
+    ) -> Callable[
+        [str, int, int], tuple[type[Token] | None, int, tuple[type[Token], ...]]
+    ]:
+        # built once per tuple of token types and shared by every lexer; per
+        # first character, the table holds the bound match of the combined
+        # regex for the token types that can start with it, and each
+        # candidate's group
+        table: dict[
+            str,
+            tuple[Callable[..., re.Match], tuple[tuple[type[Token], int | None], ...]],
+        ] = {}
+
+        def scan(
+            text: str, pos: int, endpos: int
+        ) -> tuple[type[Token] | None, int, tuple[type[Token], ...]]:
+            char: str = text[pos : pos + 1]
+            if char not in table:
+                candidates: tuple[type[Token], ...] = Lexer._candidates(
+                    token_types, char
+                )
+                regex: re.Pattern
+                groups: tuple[int | None, ...]
+                regex, groups = Lexer._combined_regex(candidates)
+                table[char] = regex.match, tuple(zip(candidates, groups))
+
+            match_at: Callable[..., re.Match]
+            candidate_groups: tuple[tuple[type[Token], int | None], ...]
+            match_at, candidate_groups = table[char]
+            reach: re.Match = match_at(text, pos, endpos)
+
+            # single pass for the longest match; if it fits multiple token
+            # types, keep the others as alternatives, latest token type first
+            result: type[Token] | None = None
+            longest: int = -1
+            alternatives: tuple[type[Token], ...] = ()
+            for token_type, group in candidate_groups:
+                end: int
+                if group is None:
+                    found: re.Match | None = token_type.regex().match(text, pos, endpos)
+                    end = -1 if found is None else found.end()
+                else:
+                    end = reach.end(group)
+                if end == -1:
+                    continue
+
+                if end > longest:
+                    result, longest, alternatives = token_type, end, ()
+                elif end == longest:
+                    result, alternatives = token_type, (result, *alternatives)
+
+            return result, longest, alternatives
+
+        return scan
+
+    def lex(self, src: Source) -> TokenStream:
         return self.Instance(src).lex()
 
+    def lex_raw(self, src: Source) -> list[tuple[int, int, int]]:
+        # (token type id, start, end) for consumers that need no Token objects;
+        # token type ids index Token.registry
+        raw: list[tuple[int, int, int]] = []
+        instance: Lexer.Instance = self.Instance(src)
+        instance.raw = raw
+        instance.lex()
+        return raw
+
 
 class GenericLexer(Lexer):
     def __init__(self, token_types: list[type[Token]]):
@@ -256,13 +483,12 @@ class GenericLexer(Lexer):
         class Instance(Lexer.Instance):
             def __init__(self, src: Source):
                 super().__init__(src)
+                self.token_types: tuple[type[Token], ...] = tuple(oself.token_types)
 
-            def lex(self) -> list[Token]:
-                result: list[Token] = []
+            def lex(self) -> TokenStream:
                 self.skip_whitespace()
-                while self.src[self.pos] != "eof":
-                    print(repr(self.src[self.pos]), ord(self.src[self.pos]))
-                    result.append(self.parse_token(oself.token_types))
-                return result
+                while self.pos < len(self.src.text):
+                    self.parse_token(self.token_types)
+                return self.tokens
 
         self.Instance: type[Lexer.Instance] = Instance
@@ -1,13 +1,16 @@
 from pl.lex import (
     Asterisk,
     Character,
+    Equals,
     GenericLexer,
+    Identifier,
     LeftParenthesis,
     Pipe,
     Plus,
     RightParenthesis,
     Source,
     Token,
+    TokenStream,
     Question,
 )
 from pl.langs import Xml
@@ -24,7 +27,7 @@ def test_0():
         Question,
     ]
     test_str: str = "a*b+(c|d)?"
-    test_result: list[Token] = GenericLexer(token_types).lex(Source(test_str))
+    test_result: TokenStream = GenericLexer(token_types).lex(Source(test_str))
     expected_lexemes: list[str] = ["a", "*", "b", "+", "(", "c", "|", "d", ")", "?"]
 
     print(test_result)
@@ -47,7 +50,7 @@ def test_1():
             <empty-tag attr="value" />
     </note>
     """
-    test_result: list[Token] = Xml.Lexer().lex(Source(test_str))
+    test_result: TokenStream = Xml.Lexer().lex(Source(test_str))
     expected_lexemes: list[str] = [
         "<?xml",
         "version",
@@ -109,3 +112,187 @@ def test_1():
         assert (
             token.lexeme == expected_lexeme
         ), f"expecting lexeme '{expected_lexeme}', got: {token}"
+
+
+def test_2():
+    test_str: bytes = b'<a href="x">link</a>'
+    test_result: TokenStream = Xml.Lexer().lex(Source(test_str))
+    expected_lexemes: list[str] = [
+        "<",
+        "a",
+        "href",
+        "=",
+        '"x"',
+        ">",
+        "link",
+        "</",
+        "a",
+        ">",
+    ]
+
+    print(test_result)
+    assert len(test_result) == len(expected_lexemes)
+    for token, expected_lexeme in zip(test_result, expected_lexemes):
+        assert (
+            token.lexeme == expected_lexeme
+        ), f"expecting lexeme '{expected_lexeme}', got: {token}"
+
+
+def test_3():
+    test_str: str = '<a b="c"/>'
+    test_result: list[tuple[int, int, int]] = Xml.Lexer().lex_raw(Source(test_str))
+    expected_tokens: list[tuple[type[Token], int, int]] = [
+        (Xml.OpenTag, 0, 1),
+        (Identifier, 1, 2),
+        (Identifier, 3, 4),
+        (Equals, 4, 5),
+        (Xml.String, 5, 8),
+        (Xml.CloseClosingTag, 8, 10),
+    ]
+
+    print(test_result)
+    assert len(test_result) == len(expected_tokens)
+    for token, (expected_type, expected_start, expected_end) in zip(
+        test_result, expected_tokens
+    ):
+        assert token == (
+            expected_type.TOKEN_TYPE_ID,
+            expected_start,
+            expected_end,
+        ), f"expecting {expected_type.token_type()} at {expected_start}, got: {token}"
+
+
+def test_4():
+    # token regexes with their own groups and backreferences
+    Quoted: type[Token] = Token.define("Quoted", r"(['\"]).*?\1")
+    Word: type[Token] = Token.define("Word", r"(?P<word>[a-z]+)")
+    Name: type[Token] = Token.define("Name", r"(?P<word>[a-z]+)_")
+    test_str: str = '\'a"b\' abc "c" ab_'
+    test_result: TokenStream = GenericLexer([Quoted, Word, Name]).lex(Source(test_str))
+    expected_tokens: list[tuple[type[Token], str]] = [
+        (Quoted, "'a\"b'"),
+        (Word, "abc"),
+        (Quoted, '"c"'),
+        (Name, "ab_"),
+    ]
+
+    print(test_result)
+    assert len(test_result) == len(expected_tokens)
+    for token, (expected_type, expected_lexeme) in zip(test_result, expected_tokens):
+        assert (
+            type(token) is expected_type and token.lexeme == expected_lexeme
+        ), f"expecting {expected_type.token_type()} '{expected_lexeme}', got: {token}"
+
+
+def test_5():
+    # token regexes with inline global flags
+    Keyword: type[Token] = Token.define("Keyword", r"(?i)select")
+    Number: type[Token] = Token.define("Number", r"(?x) [0-9]+ (?: \. [0-9]+ )?")
+    test_str: str = "SELECT 1.5 select"
+    test_result: TokenStream = GenericLexer([Keyword, Number]).lex(Source(test_str))
+    expected_tokens: list[tuple[type[Token], str]] = [
+        (Keyword, "SELECT"),
+        (Number, "1.5"),
+        (Keyword, "select"),
+    ]
+
+    print(test_result)
+    assert len(test_result) == len(expected_tokens)
+    for token, (expected_type, expected_lexeme) in zip(test_result, expected_tokens):
+        assert (
+            type(token) is expected_type and token.lexeme == expected_lexeme
+        ), f"expecting {expected_type.token_type()} '{expected_lexeme}', got: {token}"
+
+
+def test_6():
+    # single character and non-ascii text
+    test_str: str = "<a>x</a><b>héllo wörld</b>"
+    test_result: TokenStream = Xml.Lexer().lex(Source(test_str))
+    expected_tokens: list[tuple[type[Token], str]] = [
+        (Xml.OpenTag, "<"),
+        (Identifier, "a"),
+        (Xml.CloseOpeningTag, ">"),
+        (Xml.Text, "x"),
+        (Xml.OpenSelfClosingTag, "</"),
+        (Identifier, "a"),
+        (Xml.CloseOpeningTag, ">"),
+        (Xml.OpenTag, "<"),
+        (Identifier, "b"),
+        (Xml.CloseOpeningTag, ">"),
+        (Xml.Text, "héllo wörld"),
+        (Xml.OpenSelfClosingTag, "</"),
+        (Identifier, "b"),
+        (Xml.CloseOpeningTag, ">"),
+    ]
+
+    print(test_result)
+    assert len(test_result) == len(expected_tokens)
+    for token, (expected_type, expected_lexeme) in zip(test_result, expected_tokens):
+        assert (
+            type(token) is expected_type and token.lexeme == expected_lexeme
+        ), f"expecting {expected_type.token_type()} '{expected_lexeme}', got: {token}"
+
+
+def test_7():
+    test_str: str = "a+a"
+    test_result: TokenStream = GenericLexer([Character, Plus]).lex(Source(test_str))
+
+    assert test_result[0] == test_result[0]
+    assert hash(test_result[0]) == hash(test_result[0])
+    assert test_result[0] != test_result[2]
+    assert test_result[0] == Character(Source(test_str), 0, 1)
+    assert test_result[0] != Character(Source("b+a"), 0, 1)
+
+
+def test_8():
+    test_str: str = "a+b+c"
+    test_result: TokenStream = GenericLexer([Character, Plus]).lex(Source(test_str))
+
+    assert [token.lexeme for token in test_result[0:2]] == ["a", "+"]
+    assert [token.lexeme for token in test_result[::-2]] == ["c", "b", "a"]
+    assert test_result[-1].lexeme == "c"
+    assert test_result[1] in test_result
+    assert test_result.index(test_result[2]) == 2
+
+
+def test_9():
+    xml_declaration: type[Token] = Token.define("Test Xml Declaration", r"<\?xml")
+    assert xml_declaration.compiled_first_regex.fullmatch("<")
+    assert not xml_declaration.compiled_first_regex.fullmatch("?")
+
+    left_parenthesis: type[Token] = Token.define("Test Left Parenthesis", r"\(")
+    assert left_parenthesis.compiled_first_regex.fullmatch("(")
+    assert not left_parenthesis.compiled_first_regex.fullmatch("\\")
+
+    word: type[Token] = Token.define("Test Word", r"[a-z]+")
+    assert word.compiled_first_regex is None
+
+
+def test_10():
+    tokens: TokenStream = Xml.Lexer().lex(Source("<a>"))
+    assert tokens[1].TOKEN_TYPE == Identifier.TOKEN_TYPE
+    alternatives: tuple[Token, ...] = tokens.alternatives_of(1)
+    assert len(alternatives) == 1
+    assert alternatives[0].TOKEN_TYPE == Xml.TagName.TOKEN_TYPE
+    assert alternatives[0].lexeme == "a"
+    assert tokens.alternatives_of(0) == ()
+
+
+def test_11(monkeypatch):
+    test_str: str = "<a>b</a>"
+    expected: list[tuple[int, int, int]] = [
+        (token.TOKEN_TYPE_ID, token.start, token.end)
+        for token in Xml.Lexer().lex(Source(test_str))
+    ]
+
+    # lex_raw records triples without filling a TokenStream
+    def append(*args):
+        raise AssertionError("lex_raw appended to a TokenStream")
+
+    monkeypatch.setattr(TokenStream, "append", append)
+    assert Xml.Lexer().lex_raw(Source(test_str)) == expected
+    assert GenericLexer([Character, Plus]).lex_raw(Source("a+b")) == [
+        (Character.TOKEN_TYPE_ID, 0, 1),
+        (Plus.TOKEN_TYPE_ID, 1, 2),
+        (Character.TOKEN_TYPE_ID, 2, 3),
+    ]